@@ -1,6 +1,7 @@
 """
 Configuration constants.
 """
+import os
 import platform
 import shutil
 import sys
@@ -54,7 +55,10 @@ def _resolve_ffmpeg() -> Path:
 FFMPEG_PATH = _resolve_ffmpeg()
 
 # Download settings
-SLEEP_BETWEEN_TRACKS = 2  # seconds, to avoid rate limiting
+MAX_CONCURRENT_DOWNLOADS = 5  # tracks downloaded in parallel per job
+DOWNLOAD_WORKERS = int(os.environ.get("FKD_WORKERS", "8"))  # yt-dlp threads shared by all jobs
+RATE_LIMIT_BACKOFF_SECONDS = 2  # first pause after SoundCloud rate-limits a track, doubles each time
+MAX_RATE_LIMIT_BACKOFF_SECONDS = 60
 MAX_FILENAME_LENGTH = 200  # safe limit on all platforms
 
 # Server settings
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
 import asyncio
+import atexit
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
@@ -8,7 +11,47 @@ from typing import Callable
 
 import yt_dlp
 
-from app.config import FFMPEG_PATH, SLEEP_BETWEEN_TRACKS
+from app.config import (
+	DOWNLOAD_WORKERS,
+	FFMPEG_PATH,
+	MAX_CONCURRENT_DOWNLOADS,
+	MAX_RATE_LIMIT_BACKOFF_SECONDS,
+	RATE_LIMIT_BACKOFF_SECONDS,
+)
+
+
+# One pool for all jobs, so total yt-dlp threads stay bounded however many jobs run.
+_SHARED_EXECUTOR = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="fkd-dl")
+atexit.register(_SHARED_EXECUTOR.shutdown, wait=False)
+
+# Playlist metadata from extract_info(download=False), keyed by URL: {url: (monotonic_time, info)}
+_PLAYLIST_INFO_CACHE: dict[str, tuple[float, dict]] = {}
+_CACHE_TTL = 600  # seconds
+_CACHE_MAX_ENTRIES = 128
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+	# Follow yt-dlp's wrapping (DownloadError.exc_info -> ExtractorError.cause -> HTTPError)
+	# to the HTTP status, rather than matching "429" anywhere: errors start with the track id.
+	cause: BaseException | None = error
+	seen: set[int] = set()
+	while cause is not None and id(cause) not in seen:
+		seen.add(id(cause))
+		if getattr(cause, "status", None) == 429 or getattr(cause, "code", None) == 429:
+			return True
+		exc_info = getattr(cause, "exc_info", None)
+		cause = (exc_info[1] if exc_info else None) or getattr(cause, "cause", None) or cause.__cause__
+
+	msg = str(error).lower()
+	return "http error 429" in msg or "too many requests" in msg
+
+
+def _is_postprocessing_error(error: yt_dlp.utils.DownloadError) -> bool:
+	# The download itself succeeded; a post-processor (audio extraction, metadata, thumbnail) failed.
+	exc_info = error.exc_info
+	if exc_info and isinstance(exc_info[1], yt_dlp.utils.PostProcessingError):
+		return True
+	return "Postprocessing:" in str(error)
 
 
 @dataclass
@@ -48,8 +91,11 @@ class PlaylistDownloader:
 
 		self.output_dir = output_dir
 		self.progress_callback = progress_callback
-		self._executor = ThreadPoolExecutor(max_workers=1)
-		self._cancel_check: Callable[[], bool] | None = None
+		# Set by the caller to cancel the job: pending tracks are skipped and in-flight ones aborted.
+		self._cancel_event: asyncio.Event | None = None
+		# Per worker thread: the file the current track's post-processors are working on.
+		self._pp_state = threading.local()
+		self._ydl_opts = self._download_ydl_opts()
 
 	def _base_ydl_opts(self) -> dict:
 		return {
@@ -76,50 +122,111 @@ class PlaylistDownloader:
 			],
 			"writethumbnail": True,
 			"ffmpeg_location": str(FFMPEG_PATH.parent),
-			"outtmpl": str(self.output_dir / "%(title)s.%(ext)s"),
-			"ignoreerrors": True,
+			# Keyed on the track id: tracks download concurrently and titles can repeat within a
+			# playlist. ZIP entry names come from format_track_filename, not from this path.
+			"outtmpl": str(self.output_dir / "%(id)s.%(ext)s"),
+			# Raise instead of returning None, so the real cause (e.g. HTTP 429) reaches download_playlist.
+			"ignoreerrors": False,
 			"quiet": True,
 			"no_warnings": True,
 		}
 
-		def progress_hook(d):
-			if d.get("status") == "finished":
-				return
-			if d.get("status") == "downloading":
-				return
-
-		ydl_opts["progress_hooks"] = [progress_hook]
+		def cancel_hook(d):
+			# Runs on the worker thread on download progress and at the start/end of each
+			# post-processing step; a running ffmpeg conversion is not interrupted.
+			if self._cancelled():
+				raise yt_dlp.utils.DownloadCancelled()
+
+		def postprocessor_hook(d):
+			# Remember the file being post-processed, so a failing step can still keep the audio.
+			filepath = (d.get("info_dict") or {}).get("filepath")
+			if filepath:
+				self._pp_state.filepath = filepath
+			cancel_hook(d)
+
+		ydl_opts["progress_hooks"] = [cancel_hook]
+		ydl_opts["postprocessor_hooks"] = [postprocessor_hook]
 		return ydl_opts
 
-	def get_playlist_info(self, url: str) -> PlaylistInfo:
+	def _cancelled(self) -> bool:
+		return self._cancel_event is not None and self._cancel_event.is_set()
+
+	async def _run_track(self, func: Callable[[], dict]) -> dict | None:
+		"""Run a blocking track download on the shared pool.
+
+		Returns None if the job is cancelled first, but only once the worker has stopped
+		(at its next yt-dlp hook call), so nothing still uses this job's YoutubeDL
+		instances or output directory after download_playlist returns.
+		"""
+
+		future = asyncio.get_running_loop().run_in_executor(_SHARED_EXECUTOR, func)
+		if self._cancel_event is None:
+			return await future
+
+		cancel_wait = asyncio.ensure_future(self._cancel_event.wait())
+		try:
+			await asyncio.wait({future, cancel_wait}, return_when=asyncio.FIRST_COMPLETED)
+		finally:
+			cancel_wait.cancel()
+
+		if not future.done():
+			try:
+				await future
+			except Exception:
+				# Usually the DownloadCancelled raised by cancel_hook; the job is being dropped anyway.
+				pass
+			return None
+		return future.result()
+
+	def _cached_extract(self, url: str) -> dict:
+		"""Extract playlist metadata, reusing a recent result for the same URL."""
+
+		now = time.monotonic()
+		cached = _PLAYLIST_INFO_CACHE.get(url)
+		if cached and now - cached[0] < _CACHE_TTL:
+			return cached[1]
+
+		ydl_opts = self._base_ydl_opts()
+		with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+			info = ydl.extract_info(url, download=False)
+
+		_PLAYLIST_INFO_CACHE.pop(url, None)
+		while len(_PLAYLIST_INFO_CACHE) >= _CACHE_MAX_ENTRIES:
+			# Dicts keep insertion order, so the first key is the oldest entry.
+			_PLAYLIST_INFO_CACHE.pop(next(iter(_PLAYLIST_INFO_CACHE)), None)
+		_PLAYLIST_INFO_CACHE[url] = (now, info)
+		return info
+
+	def get_playlist_info(self, url: str) -> tuple[PlaylistInfo, dict]:
 		"""Extract playlist metadata without downloading.
 
 		Args:
 			url: SoundCloud playlist URL
 
 		Returns:
-			PlaylistInfo with title, track count, etc.
+			PlaylistInfo with title, track count, etc., and the raw yt-dlp info dict
+			(can be passed to download_playlist as preloaded_info)
 		"""
 
-		ydl_opts = self._base_ydl_opts()
-		with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-			info = ydl.extract_info(url, download=False)
+		info = self._cached_extract(url)
 
 		entries = info.get("entries") or []
 		track_count = sum(1 for e in entries if e)
 
-		return PlaylistInfo(
+		playlist_info = PlaylistInfo(
 			title=info.get("title") or "",
 			track_count=track_count,
 			uploader=info.get("uploader") or "",
 			url=url,
 		)
+		return playlist_info, info
 
-	async def download_playlist(self, url: str) -> DownloadResult:
+	async def download_playlist(self, url: str, preloaded_info: dict | None = None) -> DownloadResult:
 		"""Download all tracks from a SoundCloud playlist.
 
 		Args:
 			url: SoundCloud playlist URL
+			preloaded_info: Raw info dict from get_playlist_info, skips re-extracting the playlist
 
 		Returns:
 			DownloadResult with list of downloaded files and any errors
@@ -134,12 +241,9 @@ class PlaylistDownloader:
 		self.output_dir.mkdir(parents=True, exist_ok=True)
 		loop = asyncio.get_running_loop()
 
-		def extract_playlist_sync() -> dict:
-			ydl_opts = self._base_ydl_opts()
-			with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-				return ydl.extract_info(url, download=False)
-
-		playlist_info = await loop.run_in_executor(self._executor, extract_playlist_sync)
+		playlist_info = preloaded_info
+		if playlist_info is None:
+			playlist_info = await loop.run_in_executor(_SHARED_EXECUTOR, self._cached_extract, url)
 		playlist_title = playlist_info.get("title") or ""
 		entries = playlist_info.get("entries") or []
 		total_tracks = sum(1 for e in entries if e)
@@ -147,13 +251,25 @@ class PlaylistDownloader:
 		tracks: list[TrackInfo] = []
 		errors: list[dict] = []
 
-		cancel_after_current = False
+		semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+
+		# YoutubeDL setup (extractors, postprocessors) is costly but the object isn't thread-safe,
+		# so each executor thread builds one instance for this job and reuses it for every track.
+		ydl_local = threading.local()
+		ydl_instances: list[yt_dlp.YoutubeDL] = []
+
+		def thread_ydl() -> yt_dlp.YoutubeDL:
+			ydl = getattr(ydl_local, "ydl", None)
+			if ydl is None:
+				ydl = yt_dlp.YoutubeDL(self._ydl_opts)
+				ydl_local.ydl = ydl
+				ydl_instances.append(ydl)
+			return ydl
+
+		backoff = RATE_LIMIT_BACKOFF_SECONDS
 
-		for fallback_index, entry in enumerate(entries, start=1):
-			if self._cancel_check and self._cancel_check():
-				break
-			if not entry:
-				continue
+		async def download_one(entry: dict, fallback_index: int) -> None:
+			nonlocal backoff
 
 			playlist_index = entry.get("playlist_index") or fallback_index
 			title = entry.get("title") or ""
@@ -169,65 +285,100 @@ class PlaylistDownloader:
 						"error": "Missing track URL in playlist entry",
 					}
 				)
-				await asyncio.sleep(SLEEP_BETWEEN_TRACKS)
-				continue
-
-			if self.progress_callback:
-				self.progress_callback(title, total_tracks, None)
-
-			def download_track_sync() -> dict:
-				ydl_opts = self._download_ydl_opts()
-				with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-					return ydl.extract_info(track_url, download=True)
+				return
 
-			try:
-				track_result = await loop.run_in_executor(self._executor, download_track_sync)
-				file_path = None
-
-				requested = track_result.get("requested_downloads")
-				if requested and isinstance(requested, list):
-					for item in requested:
-						candidate = item.get("filepath")
-						if candidate:
-							file_path = candidate
-
-				if not file_path:
-					file_path = track_result.get("filepath") or track_result.get("_filename")
-
-				if not file_path:
-					raise RuntimeError("Could not determine downloaded file path")
-
-				mp3_path = Path(file_path)
-				if mp3_path.suffix.lower() != ".mp3":
-					candidate_mp3 = mp3_path.with_suffix(".mp3")
-					if candidate_mp3.exists():
-						mp3_path = candidate_mp3
-
-				track_info = TrackInfo(
-					index=int(playlist_index),
-					title=title or track_result.get("title"),
-					artist=artist or track_result.get("uploader"),
-					duration=int(duration or track_result.get("duration") or 0),
-					file_path=mp3_path,
-				)
-				tracks.append(track_info)
+			async with semaphore:
+				if self._cancelled():
+					return
 
 				if self.progress_callback:
-					self.progress_callback(track_info.title, total_tracks, track_info)
-			except Exception as e:
-				errors.append(
-					{
-						"index": int(playlist_index),
-						"title": title,
-						"error": str(e),
-					}
-				)
-			finally:
-				if self._cancel_check and self._cancel_check():
-					cancel_after_current = True
-				await asyncio.sleep(SLEEP_BETWEEN_TRACKS)
-
-			if cancel_after_current:
-				break
+					self.progress_callback(title, total_tracks, None)
+
+				def download_track_sync() -> dict:
+					ydl = thread_ydl()
+					self._pp_state.filepath = None
+					# The playlist extract already resolved this entry, so download it as-is
+					# instead of paying for a second metadata round trip per track.
+					resolved = ydl.sanitize_info(entry, remove_private_keys=True)
+					try:
+						return ydl.process_ie_result(resolved, download=True)
+					except yt_dlp.utils.DownloadError as e:
+						# A 429 must reach the backoff below; retrying now would only add traffic.
+						if _is_rate_limited(e):
+							raise
+						if _is_postprocessing_error(e):
+							# Re-extracting would download again only to fail the same step. Keep the
+							# audio that is already on disk, as yt-dlp does with ignoreerrors.
+							filepath = getattr(self._pp_state, "filepath", None)
+							if filepath and Path(filepath).exists():
+								return {**resolved, "filepath": filepath}
+							raise
+						# e.g. the stream URLs from the playlist extract expired; re-extract from the page.
+						return ydl.extract_info(entry.get("webpage_url") or track_url, download=True)
+
+				try:
+					track_result = await self._run_track(download_track_sync)
+					if track_result is None:
+						return
+					file_path = None
+
+					requested = track_result.get("requested_downloads")
+					if requested and isinstance(requested, list):
+						for item in requested:
+							candidate = item.get("filepath")
+							if candidate:
+								file_path = candidate
+
+					if not file_path:
+						file_path = track_result.get("filepath") or track_result.get("_filename")
+
+					if not file_path:
+						raise RuntimeError("Could not determine downloaded file path")
+
+					mp3_path = Path(file_path)
+					if mp3_path.suffix.lower() != ".mp3":
+						candidate_mp3 = mp3_path.with_suffix(".mp3")
+						if candidate_mp3.exists():
+							mp3_path = candidate_mp3
+
+					track_info = TrackInfo(
+						index=int(playlist_index),
+						title=title or track_result.get("title"),
+						artist=artist or track_result.get("uploader"),
+						duration=int(duration or track_result.get("duration") or 0),
+						file_path=mp3_path,
+					)
+					tracks.append(track_info)
+
+					if self.progress_callback:
+						self.progress_callback(track_info.title, total_tracks, track_info)
+				except yt_dlp.utils.DownloadCancelled:
+					return
+				except Exception as e:
+					errors.append(
+						{
+							"index": int(playlist_index),
+							"title": title,
+							"error": str(e),
+						}
+					)
+					if _is_rate_limited(e):
+						# Hold this slot while backing off so the whole job slows down.
+						delay = backoff
+						backoff = min(backoff * 2, MAX_RATE_LIMIT_BACKOFF_SECONDS)
+						await asyncio.sleep(delay)
+
+		# Appends to tracks/errors only happen on the event loop thread, so no lock is needed.
+		try:
+			async with asyncio.TaskGroup() as tg:
+				for fallback_index, entry in enumerate(entries, start=1):
+					if entry:
+						tg.create_task(download_one(entry, fallback_index))
+		finally:
+			for ydl in ydl_instances:
+				ydl.close()
+
+		tracks.sort(key=lambda t: t.index)
+		errors.sort(key=lambda e: e["index"])
 
 		return DownloadResult(playlist_title=playlist_title, tracks=tracks, errors=errors)
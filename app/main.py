@@ -1,44 +1,57 @@
 from __future__ import annotations
 
 import asyncio
+from collections import OrderedDict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
 import re
 import shutil
-import urllib.request
+import time
 import uuid
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 
+import httpx
 from fastapi import BackgroundTasks, FastAPI, HTTPException
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 from app.config import DOWNLOADS_DIR, FFMPEG_PATH, HOST, PORT, STATIC_DIR
-from app.downloader import PlaylistDownloader
-from app.zipper import create_playlist_zip
+from app.downloader import PlaylistDownloader, TrackInfo
+from app.zipper import PlaylistZipWriter
+
+if TYPE_CHECKING:
+	import uvicorn
+
+
+SOUNDCLOUD_PLAYLIST_RE = re.compile(r"https?://soundcloud\.com/[\w-]+/sets/[\w-]+", re.ASCII)
+SOUNDCLOUD_SHORTLINK_RE = re.compile(r"https?://on\.soundcloud\.com/[\w-]+", re.ASCII)
 
 
-SOUNDCLOUD_PLAYLIST_PATTERN = r"https?://soundcloud\.com/[\w-]+/sets/[\w-]+"
-SOUNDCLOUD_SHORTLINK_PATTERN = r"https?://on\.soundcloud\.com/[\w-]+"
+# Reused across requests so repeat shortlink lookups skip the TCP/TLS handshake.
+_SHORTLINK_CLIENT = httpx.AsyncClient(
+	follow_redirects=True,
+	timeout=15.0,
+	headers={
+		"User-Agent": "Mozilla/5.0",
+		"Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+	},
+)
 
 
-def _resolve_soundcloud_url(url: str) -> str:
+async def _resolve_soundcloud_url(url: str) -> str:
 	if not url:
 		return url
-	if not re.match(SOUNDCLOUD_SHORTLINK_PATTERN, url):
+	if not SOUNDCLOUD_SHORTLINK_RE.match(url):
 		return url
 
-	request = urllib.request.Request(
-		url,
-		headers={
-			"User-Agent": "Mozilla/5.0",
-			"Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-		},
-	)
-	with urllib.request.urlopen(request, timeout=15) as response:
-		return response.geturl()
+	# HEAD follows the redirect chain without downloading the page body.
+	response = await _SHORTLINK_CLIENT.head(url)
+	if response.status_code == 405:
+		response = await _SHORTLINK_CLIENT.get(url)
+	response.raise_for_status()
+	return str(response.url)
 
 
 class DownloadRequest(BaseModel):
@@ -75,30 +88,69 @@ class Job:
 	current_track: str | None = None
 	errors: list = field(default_factory=list)
 	zip_path: Path | None = None
+	zip_exists: bool = False
 	created_at: datetime = field(default_factory=datetime.now)
 	cancel_requested: bool = False
+	cancel_event: asyncio.Event = field(default_factory=asyncio.Event)
+	playlist_info_raw: dict | None = None
+
+
+# Insertion order is creation order, so the oldest jobs are always at the front.
+jobs: OrderedDict[str, Job] = OrderedDict()
+
+_ACTIVE_STATUSES = {"pending", "downloading", "zipping"}
+# Ids of jobs whose status is in _ACTIVE_STATUSES, kept in sync by _set_status.
+_active_job_ids: set[str] = set()
 
 
-jobs: dict[str, Job] = {}
+def _set_status(job: Job, status: str) -> None:
+	job.status = status
+	if status in _ACTIVE_STATUSES:
+		_active_job_ids.add(job.id)
+	else:
+		_active_job_ids.discard(job.id)
 
 
 # Updated whenever the user interacts with the app (downloads, status polls, heartbeat, etc.).
-LAST_ACTIVITY: datetime = datetime.now()
+# A time.monotonic() timestamp: cheap enough for the heartbeat and immune to clock changes.
+LAST_ACTIVITY: float = time.monotonic()
 
 
 def touch_activity() -> None:
 	global LAST_ACTIVITY
-	LAST_ACTIVITY = datetime.now()
+	LAST_ACTIVITY = time.monotonic()
 
 
-def get_last_activity() -> datetime:
+def get_last_activity() -> float:
 	return LAST_ACTIVITY
 
 
 def has_active_jobs() -> bool:
-	# Consider these as "active" work.
-	active = {"pending", "downloading", "zipping"}
-	return any(j.status in active for j in jobs.values())
+	return bool(_active_job_ids)
+
+
+# Set by register_watchdog (launcher only); plain `uvicorn app.main:app` runs never auto-exit.
+_watchdog_config: tuple[float, uvicorn.Server] | None = None
+WATCHDOG_MIN_SLEEP_SECONDS = 10
+
+
+def register_watchdog(timeout_seconds: float, server: uvicorn.Server) -> None:
+	"""Stop `server` once it has been idle for `timeout_seconds` with no active jobs.
+
+	Must be called before the server starts; the check runs as a task on its event loop.
+	"""
+	global _watchdog_config
+	_watchdog_config = (timeout_seconds, server)
+
+
+async def _watchdog(timeout_seconds: float, server: uvicorn.Server) -> None:
+	while not server.should_exit:
+		idle = time.monotonic() - LAST_ACTIVITY
+		if not has_active_jobs() and idle > timeout_seconds:
+			server.should_exit = True
+			return
+		# Sleep until the idle deadline could next be reached instead of ticking on a fixed interval.
+		await asyncio.sleep(max(timeout_seconds - idle, WATCHDOG_MIN_SLEEP_SECONDS))
 
 
 app = FastAPI()
@@ -111,21 +163,32 @@ async def ping():
 	return {"ok": True}
 
 
+def _rmtree_children(paths: list[Path]) -> None:
+	for child in paths:
+		if child.is_dir():
+			shutil.rmtree(child, ignore_errors=True)
+		else:
+			child.unlink(missing_ok=True)
+
+
 @app.on_event("startup")
-def cleanup_stale_downloads():
-	if DOWNLOADS_DIR.exists():
-		shutil.rmtree(DOWNLOADS_DIR)
+async def cleanup_stale_downloads():
 	DOWNLOADS_DIR.mkdir(parents=True, exist_ok=True)
+	# Snapshot leftovers from previous runs before serving, so new job dirs are never touched,
+	# then delete them off the event loop.
+	stale = list(DOWNLOADS_DIR.iterdir())
+	if stale:
+		asyncio.create_task(asyncio.to_thread(_rmtree_children, stale))
 
 
 async def cleanup_old_jobs():
 	while True:
 		await asyncio.sleep(600)
 		cutoff = datetime.now() - timedelta(hours=1)
-		for job_id, job in list(jobs.items()):
-			if job.created_at < cutoff:
-				shutil.rmtree(DOWNLOADS_DIR / job_id, ignore_errors=True)
-				del jobs[job_id]
+		while jobs and next(iter(jobs.values())).created_at < cutoff:
+			job_id, _ = jobs.popitem(last=False)
+			_active_job_ids.discard(job_id)
+			shutil.rmtree(DOWNLOADS_DIR / job_id, ignore_errors=True)
 
 
 @app.on_event("startup")
@@ -133,6 +196,17 @@ async def start_cleanup_task():
 	asyncio.create_task(cleanup_old_jobs())
 
 
+@app.on_event("startup")
+async def start_watchdog_task():
+	if _watchdog_config is not None:
+		asyncio.create_task(_watchdog(*_watchdog_config))
+
+
+@app.on_event("shutdown")
+async def close_shortlink_client():
+	await _SHORTLINK_CLIENT.aclose()
+
+
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
 
@@ -142,7 +216,8 @@ async def index():
 
 
 def _job_status_model(job: Job) -> JobStatus:
-	zip_ready = bool(job.zip_path and job.zip_path.exists())
+	# Set once the ZIP is closed, so status polls don't stat the file every time.
+	zip_ready = job.zip_exists
 	return JobStatus(
 		job_id=job.id,
 		status=job.status,  # type: ignore
@@ -160,7 +235,7 @@ def _job_status_model(job: Job) -> JobStatus:
 async def start_download(request: DownloadRequest, background_tasks: BackgroundTasks):
 	url = (request.url or "").strip()
 
-	if not (re.match(SOUNDCLOUD_PLAYLIST_PATTERN, url) or re.match(SOUNDCLOUD_SHORTLINK_PATTERN, url)):
+	if not (SOUNDCLOUD_PLAYLIST_RE.match(url) or SOUNDCLOUD_SHORTLINK_RE.match(url)):
 		raise HTTPException(status_code=400, detail="Invalid SoundCloud playlist URL")
 
 	if not FFMPEG_PATH.exists():
@@ -169,19 +244,19 @@ async def start_download(request: DownloadRequest, background_tasks: BackgroundT
 			detail="ffmpeg not found. Run 'python setup_bins.py' or install ffmpeg to your PATH.",
 		)
 
-	loop = asyncio.get_running_loop()
 	try:
-		url = await loop.run_in_executor(None, _resolve_soundcloud_url, url)
+		url = await _resolve_soundcloud_url(url)
 	except Exception:
 		raise HTTPException(status_code=400, detail="Invalid SoundCloud playlist URL")
 
-	if not re.match(SOUNDCLOUD_PLAYLIST_PATTERN, url or ""):
+	if not SOUNDCLOUD_PLAYLIST_RE.match(url or ""):
 		raise HTTPException(status_code=400, detail="Invalid SoundCloud playlist URL")
 
 	job_id = str(uuid.uuid4())
 	touch_activity()
 	job = Job(id=job_id, url=url)
 	jobs[job_id] = job
+	_set_status(job, "pending")
 
 	job_dir = DOWNLOADS_DIR / job_id
 	job_dir.mkdir(parents=True, exist_ok=True)
@@ -189,7 +264,7 @@ async def start_download(request: DownloadRequest, background_tasks: BackgroundT
 	downloader = PlaylistDownloader(job_dir)
 
 	try:
-		info = await loop.run_in_executor(None, downloader.get_playlist_info, url)
+		info, raw_info = await asyncio.to_thread(downloader.get_playlist_info, url)
 	except Exception as e:
 		msg = str(e)
 		if "private" in msg.lower():
@@ -198,6 +273,7 @@ async def start_download(request: DownloadRequest, background_tasks: BackgroundT
 
 	job.playlist_title = info.title
 	job.total_tracks = info.track_count
+	job.playlist_info_raw = raw_info
 
 	background_tasks.add_task(process_download, job_id)
 
@@ -212,6 +288,9 @@ async def process_download(job_id: str):
 	job_dir = DOWNLOADS_DIR / job_id
 	job_dir.mkdir(parents=True, exist_ok=True)
 
+	# Finished tracks are zipped while the rest are still downloading.
+	zip_queue: asyncio.Queue[TrackInfo | None] = asyncio.Queue()
+
 	def progress_callback(current_track, total_tracks, track_info):
 		touch_activity()
 		job.current_track = current_track
@@ -219,29 +298,46 @@ async def process_download(job_id: str):
 		if track_info is not None:
 			job.completed_tracks += 1
 			job.completed_tracks_info.append(track_info.title)
+			zip_queue.put_nowait(track_info)
+
+	async def zip_consumer(writer: PlaylistZipWriter) -> None:
+		while True:
+			track = await zip_queue.get()
+			if track is None:
+				return
+			await asyncio.to_thread(writer.add, track)
 
 	downloader = PlaylistDownloader(job_dir, progress_callback=progress_callback)
-	downloader._cancel_check = lambda: bool(job.cancel_requested)
+	downloader._cancel_event = job.cancel_event
 
 	try:
-		job.status = "downloading"
-		result = await downloader.download_playlist(job.url)
+		_set_status(job, "downloading")
+		writer = PlaylistZipWriter(job.playlist_title or "playlist", job_dir)
+		try:
+			consumer = asyncio.create_task(zip_consumer(writer))
+			try:
+				result = await downloader.download_playlist(job.url, preloaded_info=job.playlist_info_raw)
+			finally:
+				zip_queue.put_nowait(None)
+				_set_status(job, "zipping")
+				job.current_track = None
+				touch_activity()
+				await consumer
+		finally:
+			await asyncio.to_thread(writer.close)
+
 		job.playlist_title = result.playlist_title or job.playlist_title
 		job.errors = result.errors
-
-		job.status = "zipping"
-		touch_activity()
-		job.current_track = None
-		zip_path = create_playlist_zip(result.tracks, job.playlist_title or "playlist", job_dir)
-		job.zip_path = zip_path
+		job.zip_path = writer.zip_path
+		job.zip_exists = True
 		touch_activity()
 
 		if job.cancel_requested:
-			job.status = "cancelled"
+			_set_status(job, "cancelled")
 		else:
-			job.status = "complete"
+			_set_status(job, "complete")
 	except Exception as e:
-		job.status = "error"
+		_set_status(job, "error")
 		job.errors.append({"index": 0, "title": "", "error": str(e)})
 
 
@@ -253,6 +349,12 @@ async def get_status(job_id: str):
 	return _job_status_model(job)
 
 
+class _ZipResponse(FileResponse):
+	# 1 MiB reads (vs. the 64 KiB default) mean far fewer syscalls and loop wake-ups;
+	# FileResponse still handles Range (resumable downloads), HEAD and ETag/Last-Modified.
+	chunk_size = 1024 * 1024
+
+
 @app.get("/api/result/{job_id}")
 async def get_result(job_id: str):
 	job = jobs.get(job_id)
@@ -261,7 +363,7 @@ async def get_result(job_id: str):
 	if not job.zip_path or not job.zip_path.exists():
 		raise HTTPException(status_code=404, detail="ZIP not ready")
 
-	return FileResponse(
+	return _ZipResponse(
 		path=job.zip_path,
 		media_type="application/zip",
 		filename=job.zip_path.name,
@@ -275,6 +377,7 @@ async def cancel_job(job_id: str):
 		raise HTTPException(status_code=404, detail="Job not found")
 
 	job.cancel_requested = True
+	job.cancel_event.set()
 	return {"job_id": job_id, "status": "cancel_requested"}
 
 
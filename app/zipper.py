@@ -1,8 +1,7 @@
 from __future__ import annotations
 
-from io import BytesIO
+from collections import Counter
 from pathlib import Path
-import re
 import zipfile
 
 from app.config import MAX_FILENAME_LENGTH
@@ -10,7 +9,7 @@ from app.downloader import TrackInfo
 
 
 _INVALID_WINDOWS_CHARS = r'<>:"/\\|?*'
-_INVALID_WINDOWS_RE = re.compile(f"[{re.escape(_INVALID_WINDOWS_CHARS)}]")
+_INVALID_WINDOWS_TABLE = str.maketrans(dict.fromkeys(_INVALID_WINDOWS_CHARS, "_"))
 
 
 def sanitize_filename(name: str, max_length: int = 200) -> str:
@@ -21,11 +20,10 @@ def sanitize_filename(name: str, max_length: int = 200) -> str:
 	Truncates to max_length.
 	"""
 
-	cleaned = _INVALID_WINDOWS_RE.sub("_", name)
-	cleaned = cleaned.strip(" .")
+	cleaned = name.translate(_INVALID_WINDOWS_TABLE).strip(" .")
 	if len(cleaned) > max_length:
-		cleaned = cleaned[:max_length]
-		cleaned = cleaned.strip(" .")
+		# Only truncation can expose new trailing spaces/dots.
+		cleaned = cleaned[:max_length].rstrip(" .")
 	return cleaned
 
 
@@ -50,60 +48,84 @@ def format_track_filename(track: TrackInfo) -> str:
 	return sanitize_filename(base, max_length=MAX_FILENAME_LENGTH)
 
 
-def create_playlist_zip(tracks: list[TrackInfo], playlist_title: str, output_path: Path) -> Path:
-	"""Create a ZIP file containing all MP3s with numbered filenames.
+def _compress_type(path: Path) -> int:
+	"""MP3 frames are already compressed, so deflating them only burns CPU."""
 
-	Args:
-		tracks: List of TrackInfo with file paths
-		playlist_title: Used for ZIP filename
-		output_path: Directory to save the ZIP
+	if path.suffix.lower() == ".mp3":
+		return zipfile.ZIP_STORED
+	return zipfile.ZIP_DEFLATED
 
-	Returns:
-		Path to the created ZIP file
+
+class PlaylistZipWriter:
+	"""Append tracks to a playlist ZIP one at a time, e.g. as each download finishes.
+
+	Use as a context manager, or call close() once all tracks are added.
 	"""
 
-	output_path.mkdir(parents=True, exist_ok=True)
-	zip_name = sanitize_filename(playlist_title or "playlist", max_length=MAX_FILENAME_LENGTH)
-	if not zip_name:
-		zip_name = "playlist"
-	zip_path = output_path / f"{zip_name}.zip"
+	def __init__(self, playlist_title: str, output_path: Path):
+		"""Open the ZIP for writing.
 
-	total_bytes = 0
-	for t in tracks:
-		try:
-			total_bytes += t.file_path.stat().st_size
-		except OSError:
-			total_bytes += 0
+		Args:
+			playlist_title: Used for ZIP filename
+			output_path: Directory to save the ZIP
+		"""
 
-	in_memory = total_bytes < 100 * 1024 * 1024
+		output_path.mkdir(parents=True, exist_ok=True)
+		zip_name = sanitize_filename(playlist_title or "playlist", max_length=MAX_FILENAME_LENGTH)
+		if not zip_name:
+			zip_name = "playlist"
+		self.zip_path = output_path / f"{zip_name}.zip"
 
-	used_names: dict[str, int] = {}
+		self._fp = open(self.zip_path, "wb", buffering=4 * 1024 * 1024)
+		self._zf = zipfile.ZipFile(self._fp, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1)
+		self._used_names: Counter[str] = Counter()
 
-	def unique_zip_name(desired: str) -> str:
-		count = used_names.get(desired, 0)
-		if count == 0:
-			used_names[desired] = 1
+	def _unique_zip_name(self, desired: str) -> str:
+		self._used_names[desired] += 1
+		count = self._used_names[desired]
+		if count == 1:
 			return desired
 
-		used_names[desired] = count + 1
-		stem, suffix = Path(desired).stem, Path(desired).suffix
-		candidate = f"{stem} ({count + 1}){suffix}"
-		candidate = sanitize_filename(candidate, max_length=MAX_FILENAME_LENGTH)
-		return candidate
+		dot = desired.rfind(".")
+		stem, suffix = (desired[:dot], desired[dot:]) if dot > 0 else (desired, "")
+		# desired is already sanitized and " (N)" adds no invalid characters.
+		return f"{stem} ({count}){suffix}"
+
+	def add(self, track: TrackInfo) -> None:
+		"""Write one track into the ZIP under its numbered filename."""
 
-	if in_memory:
-		buffer = BytesIO()
-		with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-			for track in tracks:
-				arcname = unique_zip_name(format_track_filename(track))
-				zf.write(track.file_path, arcname=arcname)
+		arcname = self._unique_zip_name(format_track_filename(track))
+		self._zf.write(track.file_path, arcname=arcname, compress_type=_compress_type(track.file_path))
+
+	def close(self) -> None:
+		"""Write the central directory and close the file."""
+
+		try:
+			self._zf.close()
+		finally:
+			self._fp.close()
 
-		zip_path.write_bytes(buffer.getvalue())
-		return zip_path
+	def __enter__(self) -> PlaylistZipWriter:
+		return self
+
+	def __exit__(self, *exc_info) -> None:
+		self.close()
+
+
+def create_playlist_zip(tracks: list[TrackInfo], playlist_title: str, output_path: Path) -> Path:
+	"""Create a ZIP file containing all MP3s with numbered filenames.
+
+	Args:
+		tracks: List of TrackInfo with file paths
+		playlist_title: Used for ZIP filename
+		output_path: Directory to save the ZIP
+
+	Returns:
+		Path to the created ZIP file
+	"""
 
-	with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+	with PlaylistZipWriter(playlist_title, output_path) as writer:
 		for track in tracks:
-			arcname = unique_zip_name(format_track_filename(track))
-			zf.write(track.file_path, arcname=arcname)
+			writer.add(track)
 
-	return zip_path
+	return writer.zip_path
@@ -2,30 +2,46 @@
 Build a standalone distributable using PyInstaller.
 
 Run from the repo root:
-    python build.py
+    python build.py              # reuses PyInstaller's analysis cache in build/
+    python build.py --clean-all  # full rebuild from scratch
 
 Produces:
     Windows: dist/FlyKrewDownloader.exe
     macOS:   dist/FlyKrewDownloader.dmg
 
+Linux builds are zipped by default; `python build.py --format tar.zst` writes a
+smaller .tar.zst instead (needs `pip install zstandard`).
+
 Requirements:
-    pip install pyinstaller
+    pip install "pyinstaller>=6.6"
 """
+import argparse
+import importlib.util
 import os
 import platform
+import re
 import shutil
 import subprocess
 import sys
+import tarfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
 ROOT = Path(__file__).parent
 DIST = ROOT / "dist"
 BUILD = ROOT / "build"
+# PyInstaller's work dir (Analysis/PYZ caches); kept between builds unless --clean-all.
+PYI_WORK = BUILD / "pyi"
 APP_NAME = "FlyKrewDownloader"
-IS_WIN = platform.system() == "Windows"
-IS_MAC = platform.system() == "Darwin"
-IS_LINUX = platform.system() == "Linux"
+SYSTEM = platform.system()
+MACHINE = platform.machine()
+IS_WIN = SYSTEM == "Windows"
+IS_MAC = SYSTEM == "Darwin"
+IS_LINUX = SYSTEM == "Linux"
 
 
 def _make_plane_png(png_path: Path, size: int = 1024) -> None:
@@ -70,13 +86,34 @@ def _make_plane_png(png_path: Path, size: int = 1024) -> None:
     img.save(png_path, format="PNG")
 
 
+def _resize_all(base, sizes) -> dict:
+    """Resize a square image to each distinct size in parallel.
+
+    Pillow releases the GIL while resampling, so threads use every core
+    without the pickling cost of a process pool.
+    """
+    from PIL import Image
+
+    unique = sorted(set(sizes))
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        resized = pool.map(lambda size: base.resize((size, size), resample=Image.LANCZOS), unique)
+        return dict(zip(unique, resized))
+
+
 def _make_ico_from_png(png_path: Path, ico_path: Path) -> None:
     from PIL import Image
 
     img = Image.open(png_path).convert("RGBA")
-    sizes = [(256, 256), (128, 128), (64, 64), (48, 48), (32, 32), (16, 16)]
+    sizes = [256, 128, 64, 48, 32, 16]
+    # Pre-sized frames passed via append_images are used as-is instead of resized serially.
+    frames = _resize_all(img, sizes)
     ico_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(ico_path, format="ICO", sizes=sizes)
+    img.save(
+        ico_path,
+        format="ICO",
+        sizes=[(size, size) for size in sizes],
+        append_images=[frames[size] for size in sizes],
+    )
 
 
 def _make_icns_from_png(png_path: Path, icns_path: Path) -> None:
@@ -91,20 +128,25 @@ def _make_icns_from_png(png_path: Path, icns_path: Path) -> None:
 
     base = Image.open(png_path).convert("RGBA")
 
-    def save(size: int, name: str) -> None:
-        resized = base.resize((size, size), resample=Image.LANCZOS)
-        resized.save(iconset_dir / name, format="PNG")
-
-    save(16, "icon_16x16.png")
-    save(32, "icon_16x16@2x.png")
-    save(32, "icon_32x32.png")
-    save(64, "icon_32x32@2x.png")
-    save(128, "icon_128x128.png")
-    save(256, "icon_128x128@2x.png")
-    save(256, "icon_256x256.png")
-    save(512, "icon_256x256@2x.png")
-    save(512, "icon_512x512.png")
-    save(1024, "icon_512x512@2x.png")
+    iconset = {
+        "icon_16x16.png": 16,
+        "icon_16x16@2x.png": 32,
+        "icon_32x32.png": 32,
+        "icon_32x32@2x.png": 64,
+        "icon_128x128.png": 128,
+        "icon_128x128@2x.png": 256,
+        "icon_256x256.png": 256,
+        "icon_256x256@2x.png": 512,
+        "icon_512x512.png": 512,
+        "icon_512x512@2x.png": 1024,
+    }
+    resized = _resize_all(base, iconset.values())
+
+    def save(name: str, size: int) -> None:
+        resized[size].save(iconset_dir / name, format="PNG")
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        list(pool.map(save, iconset.keys(), iconset.values()))
 
     if icns_path.exists():
         icns_path.unlink()
@@ -152,7 +194,35 @@ def find_ffmpeg() -> Path | None:
     return None
 
 
-def run_pyinstaller() -> None:
+# Extractors the app actually uses: SoundCloud sets/tracks, plus Generic as yt-dlp's fallback.
+YT_DLP_EXTRACTORS = ("yt_dlp.extractor.soundcloud", "yt_dlp.extractor.generic")
+
+
+def yt_dlp_module_args() -> list[str]:
+    """PyInstaller args that bundle only the yt-dlp extractors the app needs.
+
+    yt-dlp wheels ship lazy_extractors, which maps every site to its module name and
+    imports it on first use, so the ~1000-module _extractors index can be left out and
+    only the SoundCloud extractors added back. Without lazy_extractors (e.g. a
+    source checkout) every extractor is bundled as before.
+    """
+    if importlib.util.find_spec("yt_dlp.extractor.lazy_extractors") is None:
+        print("  yt_dlp.extractor.lazy_extractors not found — bundling all extractors")
+        return ["--collect-submodules", "yt_dlp"]
+
+    args = [
+        "--hidden-import", "yt_dlp.extractor.lazy_extractors",
+        "--exclude-module", "yt_dlp.extractor._extractors",
+    ]
+    for module in YT_DLP_EXTRACTORS:
+        args.extend(["--hidden-import", module])
+    return args
+
+
+UNUSED_STDLIB_MODULES = ("tkinter", "test", "unittest", "pydoc_data", "lib2to3", "distutils")
+
+
+def run_pyinstaller(clean: bool = False) -> None:
     ffmpeg = find_ffmpeg()
     if not ffmpeg:
         print("ERROR: ffmpeg not found.")
@@ -165,7 +235,10 @@ def run_pyinstaller() -> None:
     cmd = [
         sys.executable, "-m", "PyInstaller",
         "--noconfirm",
-        "--clean",
+        "--workpath", str(PYI_WORK),
+        "--distpath", str(DIST),
+        # Bundle bytecode compiled as with -OO: no docstrings or asserts, smaller .pyc to load.
+        "--optimize", "2",
         # Windows ships a single .exe; macOS ships a .app bundle
         ("--onefile" if IS_WIN else "--onedir"),
         "--name", APP_NAME,
@@ -190,14 +263,32 @@ def run_pyinstaller() -> None:
         "--hidden-import", "app.config",
         "--hidden-import", "app.downloader",
         "--hidden-import", "app.zipper",
-        # Collect all yt-dlp extractors (they're loaded dynamically)
-        "--collect-all", "yt_dlp",
+        # yt-dlp's data files; its modules are found by import analysis plus yt_dlp_module_args()
+        "--collect-data", "yt_dlp",
     ]
+    cmd.extend(yt_dlp_module_args())
 
     icon_path = ensure_app_icon()
     if icon_path:
         cmd.extend(["--icon", str(icon_path)])
 
+    if clean:
+        cmd.append("--clean")
+
+    # Never UPX-pack the Python DLLs: they would be unpacked on every launch and UPX'd
+    # binaries are a common antivirus false positive. ffmpeg is stripped in setup_bins.py.
+    cmd.append("--noupx")
+
+    # Stdlib packages nothing in the app imports; dropping them shrinks the bundle.
+    for module in UNUSED_STDLIB_MODULES:
+        cmd.extend(["--exclude-module", module])
+
+    # Loose .pyc files instead of the zlib-compressed PYZ archive: imports (yt-dlp has ~1000
+    # modules) skip the per-module inflate at every launch. Only for onedir — a onefile exe
+    # would have to unpack all of them to a temp dir on each start.
+    if not IS_WIN:
+        cmd.append("--noarchive")
+
     # Windowless mode: no terminal window, browser IS the UI.
     # - Windows: --noconsole prevents a console window
     # - macOS: --windowed produces a proper .app bundle runnable via Finder
@@ -209,14 +300,184 @@ def run_pyinstaller() -> None:
     # Entry point
     cmd.append(str(ROOT / "launcher.py"))
 
-    print(f"Running PyInstaller ({platform.system()})...")
+    print(f"Running PyInstaller ({SYSTEM})...")
     print(f"  ffmpeg: {ffmpeg}")
     print(f"  Command: {' '.join(cmd)}\n")
 
     subprocess.check_call(cmd)
 
 
-def create_release_asset() -> Path:
+# Already-compressed formats: deflating them costs CPU for almost no size win.
+INCOMPRESSIBLE_SUFFIXES = {
+    ".exe", ".dll", ".pyd", ".so", ".dylib", ".zip", ".whl",
+    ".png", ".jpg", ".jpeg", ".woff2", ".ico",
+}
+
+
+# Linux shared libraries carry a version after the suffix (libpython3.11.so.1.0, libssl.so.3).
+_VERSIONED_SO_RE = re.compile(r"\.so(\.\d+)*$")
+
+
+def _suffix(name: str) -> str:
+    dot = name.rfind(".")
+    return name[dot:].lower() if dot > 0 else ""
+
+
+def _is_incompressible(name: str) -> bool:
+    return _suffix(name) in INCOMPRESSIBLE_SUFFIXES or _VERSIONED_SO_RE.search(name) is not None
+
+
+# Compressible files up to this size are deflated in parallel in memory; larger ones are streamed.
+PARALLEL_DEFLATE_MAX_BYTES = 8 * 1024 * 1024
+# Used for both the parallel and the streamed entries so the whole archive is deflated alike.
+DEFLATE_LEVEL = 6
+
+
+def _iter_files(root: str):
+    """Yield a DirEntry for every regular file under root, in sorted order.
+
+    DirEntry caches its stat() result, so each file is stat'ed once for
+    both the directory walk and its ZIP header. Symlinks are followed (their
+    targets are archived, as zip has no portable symlink entry), except a
+    directory link back to one of its own ancestors, which would never end.
+    """
+    root_st = os.stat(root)
+    stack = [(root, frozenset({(root_st.st_dev, root_st.st_ino)}))]
+    while stack:
+        path, ancestors = stack.pop()
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    st = entry.stat()
+                    key = (st.st_dev, st.st_ino)
+                    if key not in ancestors:
+                        subdirs.append((entry.path, ancestors | {key}))
+                elif entry.is_file():
+                    yield entry
+            except OSError:
+                # e.g. a dangling symlink
+                continue
+        stack.extend(reversed(subdirs))
+
+
+def _zipinfo_for(entry: os.DirEntry, arcname: str) -> zipfile.ZipInfo:
+    """Like ZipInfo.from_file, but from the DirEntry's cached stat."""
+    st = entry.stat()
+    date_time = time.localtime(st.st_mtime)[:6]
+    if date_time[0] < 1980:  # earliest date a ZIP header can hold
+        date_time = (1980, 1, 1, 0, 0, 0)
+    zinfo = zipfile.ZipInfo(arcname, date_time)
+    zinfo.external_attr = (st.st_mode & 0xFFFF) << 16
+    zinfo.file_size = st.st_size
+    return zinfo
+
+
+def _deflate_file(entry: os.DirEntry) -> tuple[int, bytes] | None:
+    """Return (crc32, raw deflate stream) for a small compressible file, else None."""
+    if _is_incompressible(entry.name) or entry.stat().st_size > PARALLEL_DEFLATE_MAX_BYTES:
+        return None
+    with open(entry.path, "rb") as f:
+        data = f.read()
+    # wbits=-15: headerless deflate, which is what a ZIP entry stores.
+    compressor = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -15)
+    return zlib.crc32(data), compressor.compress(data) + compressor.flush()
+
+
+def _write_deflated(zf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, crc: int, payload: bytes) -> None:
+    """Append an entry whose data was already deflated.
+
+    zipfile has no public API for pre-compressed data, so this does what
+    ZipFile.open(..., "w") does, minus the compression. It relies on ZipFile
+    internals (_writecheck, _didModify, _writing, start_dir, filelist,
+    NameToInfo) as of CPython 3.10-3.13; the checks below catch a layout change
+    instead of letting it write a corrupt archive (and, unlike asserts, survive -O).
+    """
+    if zf._writing:
+        raise RuntimeError("another ZIP entry is still open for writing")
+    if zf.fp.tell() != zf.start_dir:
+        raise RuntimeError("ZipFile is not positioned at the end of its entries")
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.CRC = crc
+    zinfo.compress_size = len(payload)
+    zinfo.header_offset = zf.fp.tell()
+    zf._writecheck(zinfo)
+    zf._didModify = True
+    zf.fp.write(zinfo.FileHeader())
+    zf.fp.write(payload)
+    zf.start_dir = zf.fp.tell()
+    zf.filelist.append(zinfo)
+    zf.NameToInfo[zinfo.filename] = zinfo
+
+
+def _preallocate(f, size: int) -> None:
+    """Best-effort: reserve size bytes for f so it isn't grown (and fragmented) piecemeal.
+
+    create_zip only runs for the Linux release, so this is a no-op where
+    posix_fallocate is unavailable (macOS, Windows).
+    """
+    if not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(f.fileno(), 0, size)
+    except OSError:
+        # e.g. a filesystem without fallocate support; the zip is simply grown as it's written.
+        pass
+
+
+def create_zip(src_dir: Path, zip_path: Path) -> None:
+    """Zip src_dir into zip_path, with src_dir's name as the top-level folder.
+
+    Binaries and other compressed files are stored as-is; only the rest is deflated.
+    """
+    root = str(src_dir)
+    prefix_len = len(root) + 1
+    files = list(_iter_files(root))
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        # zlib releases the GIL, so the thousands of small .pyc/.py files PyInstaller emits
+        # compress on every core; only the writes into the archive are serialized.
+        deflated = pool.map(_deflate_file, files)
+        with open(zip_path, "wb") as out:
+            # Reserve the uncompressed size up front (an upper bound for mostly-incompressible
+            # bundles) so the filesystem allocates the archive in one extent, then trim it.
+            _preallocate(out, sum(entry.stat().st_size for entry in files))
+            with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+                for entry, result in zip(files, deflated):
+                    rel = entry.path[prefix_len:]
+                    if os.sep != "/":
+                        rel = rel.replace(os.sep, "/")
+                    zinfo = _zipinfo_for(entry, f"{src_dir.name}/{rel}")
+                    if result is not None:
+                        _write_deflated(zf, zinfo, *result)
+                        continue
+
+                    if not _is_incompressible(entry.name):
+                        zinfo.compress_type = zipfile.ZIP_DEFLATED
+                        # ZipFile.open(zinfo) ignores ZipFile's compresslevel; it reads the ZipInfo's.
+                        zinfo._compresslevel = DEFLATE_LEVEL
+                    # Stream with a 1 MiB buffer (zf.write uses 8 KiB) to cut syscalls on large binaries.
+                    with open(entry.path, "rb") as src, zf.open(zinfo, "w") as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+            out.truncate()
+
+
+def create_tar_zst(src_dir: Path, out_path: Path) -> None:
+    """Tar src_dir into a zstd-compressed out_path, with src_dir's name as the top-level folder.
+
+    The tar is streamed through a multi-threaded compressor, so memory stays bounded
+    by the compression window regardless of bundle size.
+    """
+    import zstandard
+
+    with open(out_path, "wb") as out:
+        with zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(out) as cz:
+            with tarfile.open(fileobj=cz, mode="w|") as tar:
+                tar.add(src_dir, arcname=src_dir.name)
+
+
+def create_release_asset(archive_format: str = "zip") -> Path:
     """Create the single-file artifact we upload to GitHub Releases."""
     if IS_WIN:
         exe = DIST / f"{APP_NAME}.exe"
@@ -256,31 +517,53 @@ def create_release_asset() -> Path:
     if not dist_folder.exists():
         print(f"ERROR: {dist_folder} does not exist. Build failed?")
         sys.exit(1)
-    zip_name = f"{APP_NAME}-Linux.zip"
-    zip_path = DIST / zip_name
-    if zip_path.exists():
-        zip_path.unlink()
-    shutil.make_archive(str(zip_path.with_suffix("")), "zip", root_dir=DIST, base_dir=APP_NAME)
-    return zip_path
+    archive_path = DIST / f"{APP_NAME}-Linux.{archive_format}"
+    if archive_path.exists():
+        archive_path.unlink()
+    if archive_format == "tar.zst":
+        create_tar_zst(dist_folder, archive_path)
+    else:
+        create_zip(dist_folder, archive_path)
+    return archive_path
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description=f"Build {APP_NAME} with PyInstaller.")
+    parser.add_argument(
+        "--clean-all",
+        action="store_true",
+        help="delete build/ and PyInstaller's cache before building",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("zip", "tar.zst"),
+        default="zip",
+        help="archive format for the Linux release asset (default: zip)",
+    )
+    args = parser.parse_args()
+    # Fail before the (slow) PyInstaller run rather than after it.
+    if args.format == "tar.zst" and importlib.util.find_spec("zstandard") is None:
+        print("ERROR: --format tar.zst needs the zstandard package.")
+        print("Run 'pip install zstandard' or build with the default --format zip.")
+        sys.exit(1)
+
     print("=" * 50)
     print(f"  Building {APP_NAME}")
-    print(f"  Platform: {platform.system()} {platform.machine()}")
+    print(f"  Platform: {SYSTEM} {MACHINE}")
     print("=" * 50)
     print()
 
-    # Clean previous builds
-    for d in (BUILD, DIST):
+    # Clean previous builds. build/ is kept by default so PyInstaller can reuse its
+    # import analysis (and the generated icons) on the next run.
+    for d in ((BUILD, DIST) if args.clean_all else (DIST,)):
         if d.exists():
             shutil.rmtree(d)
 
     # Ensure build dirs exist early (for icon generation, etc.)
     BUILD.mkdir(parents=True, exist_ok=True)
 
-    run_pyinstaller()
-    asset_path = create_release_asset()
+    run_pyinstaller(clean=args.clean_all)
+    asset_path = create_release_asset(args.format)
 
     print()
     print("=" * 50)
@@ -290,7 +573,7 @@ def main() -> None:
     elif IS_MAC:
         print(f"  DMG:    {asset_path.name}")
     else:
-        print(f"  ZIP:    {asset_path.name}")
+        print(f"  ARCHIVE: {asset_path.name}")
     print()
     if IS_MAC:
         print(f"  To test: open dist/{APP_NAME}.app")
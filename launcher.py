@@ -7,19 +7,13 @@ Double-click this (or the packaged build) to:
 """
 import os
 import sys
-import threading
 import time
 import urllib.request
-import webbrowser
-from datetime import datetime, timedelta
-
-import uvicorn
 
 from app.config import HOST, PORT
 
 
-INACTIVITY_TIMEOUT = timedelta(minutes=15)
-WATCHDOG_POLL_SECONDS = 10
+INACTIVITY_TIMEOUT_SECONDS = 15 * 60
 
 
 URL = f"http://{HOST}:{PORT}"
@@ -44,15 +38,23 @@ def _ensure_std_streams() -> None:
     ensure("stderr")
 
 
+def _open_url() -> None:
+    # Imported on demand: webbrowser probes for installed browsers at import time
+    # (a registry walk on Windows), which isn't needed until a tab is opened.
+    import webbrowser
+
+    webbrowser.open(URL)
+
+
 def open_browser() -> None:
     """Wait for the server to be ready, then open the default browser."""
-    # Poll for readiness so we don't open a dead tab on slow startup.
-    deadline = time.time() + 20
-    while time.time() < deadline:
+    # Poll for readiness so the tab opens as soon as the server answers, not after a fixed delay.
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
         if _ping_server(timeout=1.0):
             break
         time.sleep(0.25)
-    webbrowser.open(URL)
+    _open_url()
 
 
 def _ping_server(timeout: float = 1.0) -> bool:
@@ -84,33 +86,19 @@ def _show_startup_error(title: str, message: str) -> None:
         pass
 
 
-def start_watchdog(server: uvicorn.Server) -> None:
-    """Stop the server after a period of no download activity and no active jobs."""
-    # Import here so the module state is shared with the running app in-process.
-    from app import main as app_main
-
-    while not server.should_exit:
-        try:
-            now = datetime.now()
-            last = app_main.get_last_activity()
-            active = app_main.has_active_jobs()
-            if (not active) and (now - last) > INACTIVITY_TIMEOUT:
-                server.should_exit = True
-                return
-        except Exception:
-            # Don't crash the app if watchdog has trouble.
-            pass
-        time.sleep(WATCHDOG_POLL_SECONDS)
-
-
 def main() -> None:
     _ensure_std_streams()
 
     # If an instance is already running, just open the UI and exit.
     if _ping_server(timeout=0.8):
-        webbrowser.open(URL)
+        _open_url()
         return
 
+    # Server dependencies are imported only past the "already running" fast path above.
+    import threading
+
+    import uvicorn
+
     print("=" * 50)
     print("  Fly Krew Downloader")
     print(f"  Running at {URL}")
@@ -130,8 +118,11 @@ def main() -> None:
     # Open browser in background thread (after we know we're attempting startup)
     threading.Thread(target=open_browser, daemon=True).start()
 
-    # Auto-exit watchdog
-    threading.Thread(target=start_watchdog, args=(server,), daemon=True).start()
+    # Auto-exit watchdog, run as a task on the server's own event loop.
+    # Import here so the module state is shared with the running app in-process.
+    from app import main as app_main
+
+    app_main.register_watchdog(INACTIVITY_TIMEOUT_SECONDS, server)
 
     try:
         server.run()
@@ -141,7 +132,7 @@ def main() -> None:
         msg = str(e).lower()
         if winerror == 10048 or "address already in use" in msg or "only one usage" in msg:
             if _ping_server(timeout=0.8):
-                webbrowser.open(URL)
+                _open_url()
                 return
             _show_startup_error(
                 "Fly Krew Downloader already running",
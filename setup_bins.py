@@ -5,16 +5,32 @@ Run this once after cloning the repo.
 Note: yt-dlp is installed via pip (in requirements.txt), not as a binary.
 Supports Windows (x64), macOS (Intel & Apple Silicon), and Linux (x64).
 """
+import contextlib
+import hashlib
+import io
+import json
 import os
 import platform
 import stat
+import subprocess
+import sys
 import tarfile
+import urllib.error
 import urllib.request
 import zipfile
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 BIN_DIR = Path(__file__).parent / "bin"
+# Validators for the last downloaded archive, which is kept in bin/ for reuse.
+CACHE_META_PATH = BIN_DIR / ".ffmpeg.etag"
+# Optional known-good SHA-256 of the ffmpeg archive. The default URLs track "latest"
+# builds whose hash changes with every release, so this is opt-in (e.g. for CI pinning).
+PINNED_SHA256 = os.environ.get("FFMPEG_SHA256") or None
+# Archives at least this big are fetched over RANGED_PARTS parallel connections when the server allows it.
+RANGED_PARTS = 4
+RANGED_MIN_BYTES = 8 * 1024 * 1024
 
 # ---------- download URLs per platform ----------
 _FFMPEG_URLS: dict[str, str] = {
@@ -35,25 +51,296 @@ _FFMPEG_URLS: dict[str, str] = {
 }
 
 
+# Looked up once: platform.machine() reads the registry on Windows.
+_SYSTEM = platform.system()  # Windows | Darwin | Linux
+_MACHINE = platform.machine().lower()
+
+
 def _platform_key() -> str:
-    system = platform.system()          # Windows | Darwin | Linux
-    machine = platform.machine().lower()
-    if machine in ("x86_64", "amd64"):
+    if _MACHINE in ("x86_64", "amd64"):
         arch = "x64"
-    elif machine in ("arm64", "aarch64"):
+    elif _MACHINE in ("arm64", "aarch64"):
         arch = "arm64"
     else:
-        arch = machine
-    return f"{system}-{arch}"
+        arch = _MACHINE
+    return f"{_SYSTEM}-{arch}"
+
+
+def _read_cache_meta() -> dict:
+    try:
+        return json.loads(CACHE_META_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+class _TeeReader:
+    """Readable wrapper that hashes everything read from src and copies it into sink.
+
+    Hashing as the bytes go by makes the integrity check free: the archive is never
+    read a second time just to checksum it.
+    """
+
+    def __init__(self, src, sink=None):
+        self._src = src
+        self._sink = sink
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._src.read(size)
+        self.sha256.update(data)
+        if self._sink is not None:
+            self._sink.write(data)
+        return data
+
+    def drain(self) -> None:
+        """Consume whatever the caller didn't need to read (e.g. after the member it wanted)."""
+        # 1 MiB chunks (copyfileobj defaults to 64 KiB on POSIX): fewer syscalls on an ~80 MB archive.
+        while self.read(1024 * 1024):
+            pass
+
+
+def _check_sha256(digest: str, expected: str | None, what: str) -> None:
+    if expected and digest != expected.lower():
+        raise RuntimeError(f"{what} failed SHA-256 check (got {digest}, expected {expected})")
+
+
+class _MemoryReader(io.RawIOBase):
+    """Seekable read-only stream over a buffer; unlike io.BytesIO it doesn't copy a bytearray."""
+
+    def __init__(self, buf):
+        self._view = memoryview(buf)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        chunk = self._view[self._pos:self._pos + len(b)]
+        memoryview(b).cast("B")[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(base + offset, 0)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def _serve(reader: _TeeReader, seekable: bool, verify):
+    """Yield the stream to extract from, pass the archive's SHA-256 to verify, and return it."""
+    if seekable:
+        data = reader.read()
+        verify(reader.sha256.hexdigest())
+        # BytesIO shares (rather than copies) an immutable bytes object.
+        yield io.BytesIO(data)
+    else:
+        yield reader
+        reader.drain()
+        verify(reader.sha256.hexdigest())
+    return reader.sha256.hexdigest()
+
+
+def _readinto_exactly(resp, view: memoryview) -> None:
+    while view:
+        n = resp.readinto(view)
+        if not n:
+            raise urllib.error.URLError("connection closed before the download finished")
+        view = view[n:]
+
 
+def _fetch_range(url: str, view: memoryview, start: int) -> None:
+    end = start + len(view) - 1
+    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0", "Range": f"bytes={start}-{end}"})
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        if resp.status != 206:
+            raise urllib.error.URLError(f"server ignored Range request (HTTP {resp.status})")
+        _readinto_exactly(resp, view)
 
-def _download(url: str, dest: Path) -> None:
+
+def _use_ranges(resp) -> bool:
+    size = int(resp.headers.get("Content-Length") or 0)
+    return resp.headers.get("Accept-Ranges", "").lower() == "bytes" and size >= RANGED_MIN_BYTES
+
+
+def _read_ranged(resp) -> bytearray:
+    """Read the whole response, fetching all but its first part over parallel Range requests.
+
+    A single connection is often throttled well below the link speed (GitHub release
+    assets in particular). The first part is read from resp itself, so the request
+    already made isn't wasted; if any ranged part fails, the rest is read from resp.
+    """
+    size = int(resp.headers["Content-Length"])
+    buf = bytearray(size)
+    view = memoryview(buf)
+    part_size = -(-size // RANGED_PARTS)
+    # Ranges go to the final URL so each part skips the redirect (GitHub → CDN).
+    final_url = resp.geturl()
+    with ThreadPoolExecutor(max_workers=RANGED_PARTS - 1) as pool:
+        futures = [
+            pool.submit(_fetch_range, final_url, view[start:start + part_size], start)
+            for start in range(part_size, size, part_size)
+        ]
+        _readinto_exactly(resp, view[:part_size])
+        try:
+            for future in futures:
+                future.result()
+        except (OSError, ValueError) as e:
+            print(f"  Parallel download failed ({e}); continuing on one connection.")
+            _readinto_exactly(resp, view[part_size:])
+    return buf
+
+
+@contextlib.contextmanager
+def _open_download(url: str, dest: Path, seekable: bool = False):
+    """Yield a readable stream of url's content while saving it to dest.
+
+    The ETag/Last-Modified of the last download are kept in CACHE_META_PATH and
+    sent back as a conditional GET; on a 304 the cached dest is yielded instead.
+    Otherwise the caller reads straight from the network (or from memory when
+    seekable=True, which zip's central directory needs) while the bytes are
+    written to dest once, so the archive is never re-read from disk.
+
+    The SHA-256 of the archive is computed while it streams, stored with the cache
+    validators, and checked against FFMPEG_SHA256 (if set) and, for a cached copy,
+    against the digest recorded when it was downloaded. A mismatch raises RuntimeError.
+    """
     print(f"  Downloading from {url}")
-    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-    with urllib.request.urlopen(req, timeout=120) as resp, open(dest, "wb") as f:
-        shutil.copyfileobj(resp, f)
+    headers = {"User-Agent": "Mozilla/5.0"}
+    meta = _read_cache_meta()
+    if dest.exists() and meta.get("url") == url and meta.get("file") == dest.name:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        resp = urllib.request.urlopen(req, timeout=120)
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            raise
+        resp = None
+
+    if resp is None:
+        print("  Cached copy is up to date — skipping download.")
+        try:
+            with open(dest, "rb") as f:
+                # The cache is a local file, so hash it up front: a corrupt archive is caught
+                # here rather than failing half-way through extraction.
+                digest = hashlib.file_digest(f, "sha256").hexdigest()
+                _check_sha256(digest, meta.get("sha256"), f"Cached {dest.name}")
+                _check_sha256(digest, PINNED_SHA256, f"Cached {dest.name}")
+                f.seek(0)
+                yield f
+        except Exception:
+            # Whether the hash or the extraction failed, don't let this cache be reused.
+            dest.unlink(missing_ok=True)
+            CACHE_META_PATH.unlink(missing_ok=True)
+            raise
+        return
+
+    part_path = dest.with_name(dest.name + ".part")
+    try:
+        with resp, open(part_path, "wb") as part:
+            if _use_ranges(resp):
+                # Ranged parts land in one buffer, which is saved, hashed and extracted in place.
+                buf = _read_ranged(resp)
+                part.write(buf)
+                digest = hashlib.sha256(buf).hexdigest()
+                _check_sha256(digest, PINNED_SHA256, url)
+                yield _MemoryReader(buf)
+            else:
+                # Otherwise the response is extracted as it streams.
+                digest = yield from _serve(
+                    _TeeReader(resp, part), seekable, lambda d: _check_sha256(d, PINNED_SHA256, url)
+                )
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+
+    part_path.replace(dest)
+    CACHE_META_PATH.write_text(
+        json.dumps({
+            "url": url,
+            "file": dest.name,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": digest,
+        }),
+        encoding="utf-8",
+    )
 
 
+def _strip_binary(path: Path) -> None:
+    """Drop debug symbols from ffmpeg so the bundle ships (and loads) a smaller binary.
+
+    Linux only: stripping the macOS build would invalidate its code signature, and the
+    Windows build has no symbols to strip. This replaces UPX, which build.py disables.
+    """
+    strip = shutil.which("strip")
+    if not strip:
+        return
+    print("Stripping debug symbols...")
+    subprocess.run([strip, "-S", str(path)], check=False)
+
+
+def _fetch_ffmpeg(url: str, binary_name: str, dest_path: Path) -> None:
+    """Download url and put the ffmpeg binary it contains at dest_path.
+
+    The binary is extracted to a .part file and only moved into place once the whole
+    archive has arrived and passed its checksum, so an interrupted run never leaves a
+    truncated dest_path behind (which the next run would skip as "already exists").
+    """
+    if not (url.endswith(".zip") or url.endswith(".tar.xz")):
+        # Direct binary download: nothing to extract; _open_download saves it via its own .part file.
+        with _open_download(url, dest_path):
+            pass
+        return
+
+    part_path = dest_path.with_name(dest_path.name + ".part")
+    try:
+        if url.endswith(".zip"):
+            archive_path = BIN_DIR / "ffmpeg.zip"
+            # zip keeps its index at the end, so it is extracted from memory rather than the stream.
+            with _open_download(url, archive_path, seekable=True) as archive:
+                print("Extracting...")
+                with zipfile.ZipFile(archive, "r") as zf:
+                    for name in zf.namelist():
+                        # Windows zip has nested bin/ffmpeg.exe; macOS zip has ffmpeg at root
+                        basename = name.rsplit("/", 1)[-1]
+                        if basename == binary_name:
+                            # 1 MiB reads: far fewer inflate calls than copyfileobj's default on a ~100 MB entry.
+                            with zf.open(name) as src, open(part_path, "wb") as dst:
+                                shutil.copyfileobj(src, dst, length=1024 * 1024)
+                            break
+        else:
+            archive_path = BIN_DIR / "ffmpeg.tar.xz"
+            with _open_download(url, archive_path) as archive:
+                print("Extracting...")
+                # "r|xz" reads the tar sequentially, so extraction runs as the download arrives.
+                with tarfile.open(fileobj=archive, mode="r|xz") as tf:
+                    for member in tf:
+                        if member.name.endswith("/ffmpeg") or member.name == "ffmpeg":
+                            # Copy the member directly (in 1 MiB chunks) instead of tf.extract;
+                            # the executable bit is set by the caller.
+                            with tf.extractfile(member) as src, open(part_path, "wb") as dst:
+                                shutil.copyfileobj(src, dst, length=1024 * 1024)
+                            break
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+
+    if part_path.exists():
+        part_path.replace(dest_path)
+
 def download_ffmpeg() -> None:
     key = _platform_key()
     url = _FFMPEG_URLS.get(key)
@@ -63,7 +350,7 @@ def download_ffmpeg() -> None:
         print("Please download ffmpeg manually and place it in the bin/ folder.")
         return
 
-    is_win = platform.system() == "Windows"
+    is_win = _SYSTEM == "Windows"
     binary_name = "ffmpeg.exe" if is_win else "ffmpeg"
     dest_path = BIN_DIR / binary_name
 
@@ -73,40 +360,20 @@ def download_ffmpeg() -> None:
 
     print(f"Downloading ffmpeg for {key}...")
 
-    if url.endswith(".zip"):
-        archive_path = BIN_DIR / "ffmpeg.zip"
-        _download(url, archive_path)
-        print("Extracting...")
-        with zipfile.ZipFile(archive_path, "r") as zf:
-            for name in zf.namelist():
-                # Windows zip has nested bin/ffmpeg.exe; macOS zip has ffmpeg at root
-                basename = name.rsplit("/", 1)[-1]
-                if basename == binary_name:
-                    with zf.open(name) as src, open(dest_path, "wb") as dst:
-                        shutil.copyfileobj(src, dst)
-                    break
-        archive_path.unlink(missing_ok=True)
-
-    elif url.endswith(".tar.xz"):
-        archive_path = BIN_DIR / "ffmpeg.tar.xz"
-        _download(url, archive_path)
-        print("Extracting...")
-        with tarfile.open(archive_path, "r:xz") as tf:
-            for member in tf.getmembers():
-                if member.name.endswith("/ffmpeg") or member.name == "ffmpeg":
-                    member.name = binary_name
-                    tf.extract(member, path=BIN_DIR)
-                    break
-        archive_path.unlink(missing_ok=True)
-
-    else:
-        # Direct binary download
-        _download(url, dest_path)
+    try:
+        _fetch_ffmpeg(url, binary_name, dest_path)
+    except (RuntimeError, tarfile.TarError, zipfile.BadZipFile) as e:
+        # Checksum mismatch or a corrupt/truncated archive; any cached copy was already discarded.
+        print(f"ERROR: {e}")
+        sys.exit(1)
 
     # Make executable on Unix
     if not is_win and dest_path.exists():
         dest_path.chmod(dest_path.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
 
+    if _SYSTEM == "Linux" and dest_path.exists():
+        _strip_binary(dest_path)
+
     if dest_path.exists():
         print(f"{binary_name} ready!")
     else: